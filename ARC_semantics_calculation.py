@@ -26,137 +26,91 @@
 # ------------------------------------------------------------------------------
 
 import os
-import pandas as pd
+import numpy as np
+from bgs_common import (attack_matrix, find_bag_files, load_bag, max_change, run_fixed_point,
+                        run_on_files, use_parallel_kernel)
 
-def compute_f_arc(arg, attacks_dict, f_prev, g_prev, weights, arguments):
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+def iterate_arc_numpy(indptr, indices, active, w, f_prev, g_prev, out_f, out_g, att, coef):
     """
-    Compute f(a) under ARC semantics:
-      f(a) = w(a) / [1 + |Att^*(a)| + (1/n)* sum( f(b)/(1+g(b)) ) ]
-    where Att^*(a) includes attackers b with w(b)>0.
+    One ARC update (coef = 1/n) for every argument in active, i.e. those with
+    founded attackers, written to out_f/out_g; returns the largest change:
+      f(a) = w(a) / [1 + |Att^*(a)| + coef* sum( f(b)/(1+g(b)) ) ]
+      g(a) = [ |Att^*(a)| + coef* sum(f(b)) ] / [ 1 + ... ]
+    The other arguments keep f(a) = w(a), g(a) = 0 and are never touched.
+    att is attack_matrix(graph), so both sums over Att^*(a) are sparse
+    matrix-vector products.
     """
-    attackers = attacks_dict.get(arg, set())
-    founded_atts = [b for b in attackers if weights.get(b, 0.0) > 0.0]
-    if not founded_atts:
-        return weights[arg]
-
-    n = len(arguments)
-    sum_infl = sum(f_prev[b] / (1.0 + g_prev[b]) for b in founded_atts)
-    return weights[arg] / (1.0 + len(founded_atts) + (1.0/n)*sum_infl)
-
-def compute_g_arc(arg, attacks_dict, f_prev, g_prev, weights, arguments):
+    starts = indptr[active]
+    cnt = (indptr[active + 1] - starts).astype(np.float64)
+    sum_infl = att @ (f_prev / (1.0 + g_prev))
+    sum_f = att @ f_prev
+    f_new = w[active] / (1.0 + cnt + coef*sum_infl)
+    g_new = (cnt + coef*sum_f) / (1.0 + cnt + coef*sum_f)
+    max_delta = max_change(f_new, f_prev[active], g_new, g_prev[active])
+    out_f[active] = f_new
+    out_g[active] = g_new
+    return max_delta
+
+def _iterate_arc_loops(indptr, indices, active, w, f_prev, g_prev, out_f, out_g, coef):
     """
-    Compute g(a) under ARC semantics:
-      g(a) = [ |Att^*(a)| + (1/n)* sum_{b in Att^*(a)} f(b ) ] / [ 1 + ... ]
-    If Att^*(a) is empty, g(a) = 0.
+    Same update as iterate_arc_numpy as a single pass over the CSR rows,
+    for compilation with Numba. Each f(a), g(a) only reads the previous
+    iterate, so with parallel=True the rows are split across threads.
     """
-    attackers = attacks_dict.get(arg, set())
-    founded_atts = [b for b in attackers if weights.get(b, 0.0) > 0.0]
-    if not founded_atts:
-        return 0.0
-
-    n = len(arguments)
-    sum_f = sum(f_prev[b] for b in founded_atts)
-    numerator = len(founded_atts) + (1.0/n)*sum_f
-    denominator = 1.0 + len(founded_atts) + (1.0/n)*sum_f
-    return numerator / denominator
-
-def process_bag_file_ARC(bag_file_path, epsilon=1e-4, max_iterations=20):
+    max_delta = 0.0
+    for j in prange(active.shape[0]):
+        i = active[j]
+        sum_infl = 0.0
+        sum_f = 0.0
+        for k in range(indptr[i], indptr[i + 1]):
+            b = indices[k]
+            sum_infl += f_prev[b] / (1.0 + g_prev[b])
+            sum_f += f_prev[b]
+        cnt = indptr[i + 1] - indptr[i]
+        out_f[i] = w[i] / (1.0 + cnt + coef*sum_infl)
+        out_g[i] = (cnt + coef*sum_f) / (1.0 + cnt + coef*sum_f)
+        max_delta = max(max_delta, max(abs(out_f[i] - f_prev[i]), abs(out_g[i] - g_prev[i])))
+    return max_delta
+
+if njit is not None:
+    iterate_arc = njit(fastmath=True, cache=True)(_iterate_arc_loops)
+    # Not cached: Numba's on-disk cache is keyed by function and signature
+    # only, so it would be shared with the serial build above.
+    iterate_arc_parallel = njit(fastmath=True, parallel=True)(_iterate_arc_loops)
+else:
+    iterate_arc = iterate_arc_parallel = None
+
+def process_bag_file_ARC(bag_file_path, epsilon=1e-4, max_iterations=20, save_iterations=True,
+                         accelerate=False, graph=None):
     """
     Parse the .bag file, run ARC iterative updates, and output the results.
+    A graph already returned by load_bag(bag_file_path) can be passed in to
+    skip parsing. Per-iteration values are streamed to CSV only if save_iterations;
+    accelerate turns on Anderson acceleration (see run_fixed_point).
     """
-    weights = {}
-    attacks_dict = {}
-
-    # 1) Parse .bag
-    try:
-        with open(bag_file_path, 'r', encoding='utf-8') as file:
-            for line in file:
-                line = line.strip()
-                if line.startswith("arg(") and line.endswith(")"):
-                    content = line[4:-1]
-                    arg_name, w_str = content.split(',')
-                    arg_name = arg_name.strip()
-                    w_val = float(w_str.strip())
-                    weights[arg_name] = w_val
-                elif line.startswith("att(") and line.endswith(")"):
-                    content = line[4:-1]
-                    attacker, attacked = content.split(',')
-                    attacker = attacker.strip()
-                    attacked = attacked.strip()
-                    if attacked not in attacks_dict:
-                        attacks_dict[attacked] = set()
-                    attacks_dict[attacked].add(attacker)
-                else:
-                    continue
-    except Exception as e:
-        print(f"[ARC] Error reading file {bag_file_path}: {e}")
-        return
-
-    arguments = sorted(weights.keys())
-    # Initialize
-    f_current = {a: weights[a] for a in arguments}
-    g_current = {a: 0.0 for a in arguments}
-
-    iteration = 0
-    converged = False
-    iterative_logs = []
-
-    while iteration < max_iterations and not converged:
-        iteration += 1
-        f_next = {}
-        g_next = {}
-        max_delta = 0.0
-
-        for a in arguments:
-            f_val = compute_f_arc(a, attacks_dict, f_current, g_current, weights, arguments)
-            g_val = compute_g_arc(a, attacks_dict, f_current, g_current, weights, arguments)
-            f_next[a] = f_val
-            g_next[a] = g_val
-
-            df = abs(f_val - f_current[a])
-            dg = abs(g_val - g_current[a])
-            max_delta = max(max_delta, df, dg)
-
-        iterative_logs.append((iteration, f_next.copy(), g_next.copy()))
-        f_current = f_next
-        g_current = g_next
-
-        if max_delta < epsilon:
-            converged = True
-            print(f"[ARC] Converged after {iteration} iterations: {os.path.basename(bag_file_path)}.")
-
-    if not converged:
-        print(f"[ARC] Not converged within {max_iterations} iterations: {os.path.basename(bag_file_path)}.")
-
-    # Print final
-    print(f"\n[ARC] Final degrees for {os.path.basename(bag_file_path)}:")
-    print("---------------------------------------")
-    print(f"{'Argument':<10} {'f(a)':<12} {'g(a)':<12}")
-    for a in arguments:
-        print(f"{a:<10} {f_current[a]:<12.6f} {g_current[a]:<12.6f}")
-
-    # CSV logs
-    iter_data = []
-    for (it_num, f_vals, g_vals) in iterative_logs:
-        for arg in arguments:
-            iter_data.append({
-                'Iteration': it_num,
-                'Argument': arg,
-                'f(a)': f_vals[arg],
-                'g(a)': g_vals[arg]
-            })
-    df_iter = pd.DataFrame(iter_data)
-    csv_iter_path = os.path.splitext(bag_file_path)[0] + '_arc_iter.csv'
-    df_iter.to_csv(csv_iter_path, index=False)
-
-    # Final CSV
-    final_df = pd.DataFrame({
-        'Argument': arguments,
-        'f(a)': [f_current[a] for a in arguments],
-        'g(a)': [g_current[a] for a in arguments]
-    })
-    csv_final_path = os.path.splitext(bag_file_path)[0] + '_arc_final.csv'
-    final_df.to_csv(csv_final_path, index=False)
+    if graph is None:
+        try:
+            graph = load_bag(bag_file_path)
+        except Exception as e:
+            print(f"[ARC] Error reading file {bag_file_path}: {e}")
+            return
+
+    n = len(graph[0])
+    coef = 1.0/n if n else 0.0
+    if njit is None:
+        iterate, iterate_args = iterate_arc_numpy, (attack_matrix(graph), coef)
+    elif use_parallel_kernel(graph):
+        iterate, iterate_args = iterate_arc_parallel, (coef,)
+    else:
+        iterate, iterate_args = iterate_arc, (coef,)
+    return run_fixed_point('ARC', bag_file_path, graph, iterate, iterate_args,
+                           epsilon, max_iterations, save_iterations, accelerate)
 
 def main():
     """
@@ -167,11 +121,7 @@ def main():
         print(f"[ARC] Benchmarks directory not found: {benchmarks_dir}")
         return
 
-    for root, dirs, files in os.walk(benchmarks_dir):
-        for file_name in files:
-            if file_name.endswith('.bag'):
-                file_path = os.path.join(root, file_name)
-                process_bag_file_ARC(file_path)
+    run_on_files(process_bag_file_ARC, find_bag_files(benchmarks_dir))
 
 if __name__ == "__main__":
     main()
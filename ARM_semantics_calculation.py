@@ -18,145 +18,98 @@
 #   f(a) = w(a) / [ 1 + max_{b in Att(a)}( f(b)/(1+g(b)) ) ]
 #   g(a) = [ max_{b in Att(a)} f(b) ] / [ 1 + max_{b in Att(a)} f(b) ]
 #
-# If Att(a) is empty, we treat the max term as 0.
+# If Att(a) is empty, we treat the max term as 0. Attackers with w(b)=0 keep
+# f(b)=0 and never raise a max term, so they are left out of Att(a).
 #
 # ------------------------------------------------------------------------------
 
 import os
-import pandas as pd
+from bgs_common import (find_bag_files, load_bag, max_change, run_fixed_point, run_on_files,
+                        segment_max, use_parallel_kernel)
 
-def compute_f_arm(arg, attacks_dict, f_prev, g_prev, weights):
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+def iterate_arm_numpy(indptr, indices, active, w, f_prev, g_prev, out_f, out_g):
     """
-    Compute f(a) for argument 'arg' under ARM semantics:
+    One ARM update for every argument in active, i.e. those with attackers,
+    written to out_f/out_g; returns the largest change:
       f(a) = w(a) / (1 + max_{b in Att(a)}( f(b)/(1 + g(b)) ))
-    If there are no attackers, f(a) = w(a).
+      g(a) = [max_{b in Att(a)} f(b)] / [1 + max_{b in Att(a)} f(b)]
+    The other arguments have both max terms 0, so they keep f(a) = w(a),
+    g(a) = 0 and are never touched.
     """
-    attackers = attacks_dict.get(arg, set())
-    if not attackers:
-        return weights[arg]
-    else:
-        infl = max(f_prev[b] / (1.0 + g_prev[b]) for b in attackers)
-        return weights[arg] / (1.0 + infl)
-
-def compute_g_arm(arg, attacks_dict, f_prev, g_prev):
+    starts = indptr[active]
+    # One division per argument, then a single gather per max term
+    infl = segment_max((f_prev / (1.0 + g_prev))[indices], starts)
+    max_f = segment_max(f_prev[indices], starts)
+    f_new = w[active] / (1.0 + infl)
+    g_new = max_f / (1.0 + max_f)
+    max_delta = max_change(f_new, f_prev[active], g_new, g_prev[active])
+    out_f[active] = f_new
+    out_g[active] = g_new
+    return max_delta
+
+def _iterate_arm_loops(indptr, indices, active, w, f_prev, g_prev, out_f, out_g):
     """
-    Compute g(a) for argument 'arg' under ARM semantics:
-      g(a) = [max_{b in Att(a)} f(b)] / [1 + max_{b in Att(a)} f(b)]
-    If there are no attackers, g(a) = 0.
+    Same update as iterate_arm_numpy as a single pass over the CSR rows,
+    for compilation with Numba. Each f(a), g(a) only reads the previous
+    iterate, so with parallel=True the rows are split across threads.
     """
-    attackers = attacks_dict.get(arg, set())
-    if not attackers:
-        return 0.0
-    else:
-        max_f = max(f_prev[b] for b in attackers)
-        return max_f / (1.0 + max_f)
-
-def process_bag_file_ARM(bag_file_path, epsilon=1e-4, max_iterations=20):
+    max_delta = 0.0
+    for j in prange(active.shape[0]):
+        i = active[j]
+        infl = 0.0
+        max_f = 0.0
+        for k in range(indptr[i], indptr[i + 1]):
+            b = indices[k]
+            v = f_prev[b] / (1.0 + g_prev[b])
+            if v > infl:
+                infl = v
+            if f_prev[b] > max_f:
+                max_f = f_prev[b]
+        out_f[i] = w[i] / (1.0 + infl)
+        out_g[i] = max_f / (1.0 + max_f)
+        max_delta = max(max_delta, max(abs(out_f[i] - f_prev[i]), abs(out_g[i] - g_prev[i])))
+    return max_delta
+
+if njit is not None:
+    iterate_arm = njit(fastmath=True, cache=True)(_iterate_arm_loops)
+    # Not cached: Numba's on-disk cache is keyed by function and signature
+    # only, so it would be shared with the serial build above.
+    iterate_arm_parallel = njit(fastmath=True, parallel=True)(_iterate_arm_loops)
+else:
+    iterate_arm = iterate_arm_parallel = None
+
+def process_bag_file_ARM(bag_file_path, epsilon=1e-4, max_iterations=20, save_iterations=True,
+                         accelerate=False, graph=None):
     """
     Parse a single .bag file, run iterative ARM updates, and output final results.
+    A graph already returned by load_bag(bag_file_path) can be passed in to
+    skip parsing. Per-iteration values are streamed to CSV only if save_iterations;
+    accelerate turns on Anderson acceleration (see run_fixed_point).
     """
-    weights = {}
-    attacks_dict = {}
-
-    # 1) Parse .bag file (only arg(...) / att(...))
-    try:
-        with open(bag_file_path, 'r', encoding='utf-8') as file:
-            for line in file:
-                line = line.strip()
-                if line.startswith("arg(") and line.endswith(")"):
-                    # Example: arg(a, 0.6)
-                    content = line[4:-1]
-                    arg_name, w_str = content.split(',')
-                    arg_name = arg_name.strip()
-                    w_val = float(w_str.strip())
-                    weights[arg_name] = w_val
-                elif line.startswith("att(") and line.endswith(")"):
-                    # Example: att(x,a)
-                    content = line[4:-1]
-                    attacker, attacked = content.split(',')
-                    attacker = attacker.strip()
-                    attacked = attacked.strip()
-                    if attacked not in attacks_dict:
-                        attacks_dict[attacked] = set()
-                    attacks_dict[attacked].add(attacker)
-                else:
-                    # Ignore lines not matching arg(...) or att(...)
-                    continue
-    except FileNotFoundError:
-        print(f"Error: File {bag_file_path} not found.")
-        return
-    except Exception as e:
-        print(f"Error processing file {bag_file_path}: {e}")
-        return
-
-    # Collect all argument names
-    arguments = sorted(weights.keys())
-
-    # 2) Initialize f^0(a)=w(a), g^0(a)=0
-    f_current = {arg: weights[arg] for arg in arguments}
-    g_current = {arg: 0.0 for arg in arguments}
-
-    # 3) Iterative updates
-    iteration = 0
-    converged = False
-    iterative_logs = []
-
-    while iteration < max_iterations and not converged:
-        iteration += 1
-        f_next = {}
-        g_next = {}
-        max_delta = 0.0
-
-        for arg in arguments:
-            f_val = compute_f_arm(arg, attacks_dict, f_current, g_current, weights)
-            g_val = compute_g_arm(arg, attacks_dict, f_current, g_current)
-            f_next[arg] = f_val
-            g_next[arg] = g_val
-
-            delta_f = abs(f_val - f_current[arg])
-            delta_g = abs(g_val - g_current[arg])
-            max_delta = max(max_delta, delta_f, delta_g)
-
-        iterative_logs.append((iteration, f_next.copy(), g_next.copy()))
-        f_current = f_next
-        g_current = g_next
-
-        if max_delta < epsilon:
-            converged = True
-            print(f"[ARM] Converged after {iteration} iterations: {os.path.basename(bag_file_path)}.")
-
-    if not converged:
-        print(f"[ARM] Did not converge within {max_iterations} iterations: {os.path.basename(bag_file_path)}.")
-
-    # 4) Print final results
-    print(f"\n[ARM] Final degrees for {os.path.basename(bag_file_path)}:")
-    print("---------------------------------------")
-    print(f"{'Argument':<10} {'f(a)':<12} {'g(a)':<12}")
-    for arg in arguments:
-        print(f"{arg:<10} {f_current[arg]:<12.6f} {g_current[arg]:<12.6f}")
-
-    # 5) Save iteration logs to CSV
-    iter_data = []
-    for (it_num, f_vals, g_vals) in iterative_logs:
-        for arg in arguments:
-            iter_data.append({
-                'Iteration': it_num,
-                'Argument': arg,
-                'f(a)': f_vals[arg],
-                'g(a)': g_vals[arg]
-            })
-    df_iter = pd.DataFrame(iter_data)
-    csv_iter_path = os.path.splitext(bag_file_path)[0] + '_arm_iter.csv'
-    df_iter.to_csv(csv_iter_path, index=False)
-
-    # 6) Save final result to CSV
-    final_df = pd.DataFrame({
-        'Argument': arguments,
-        'f(a)': [f_current[a] for a in arguments],
-        'g(a)': [g_current[a] for a in arguments]
-    })
-    csv_final_path = os.path.splitext(bag_file_path)[0] + '_arm_final.csv'
-    final_df.to_csv(csv_final_path, index=False)
+    if graph is None:
+        try:
+            graph = load_bag(bag_file_path)
+        except FileNotFoundError:
+            print(f"Error: File {bag_file_path} not found.")
+            return
+        except Exception as e:
+            print(f"Error processing file {bag_file_path}: {e}")
+            return
+
+    if njit is None:
+        iterate = iterate_arm_numpy
+    elif use_parallel_kernel(graph):
+        iterate = iterate_arm_parallel
+    else:
+        iterate = iterate_arm
+    return run_fixed_point('ARM', bag_file_path, graph, iterate, (),
+                           epsilon, max_iterations, save_iterations, accelerate)
 
 def main():
     """
@@ -168,11 +121,7 @@ def main():
         print(f"Benchmarks directory not found: {benchmarks_dir}")
         return
 
-    for root, dirs, files in os.walk(benchmarks_dir):
-        for file_name in files:
-            if file_name.endswith('.bag'):
-                file_path = os.path.join(root, file_name)
-                process_bag_file_ARM(file_path)
+    run_on_files(process_bag_file_ARM, find_bag_files(benchmarks_dir))
 
 if __name__ == "__main__":
     main()
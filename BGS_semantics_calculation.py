@@ -0,0 +1,60 @@
+# BGS_semantics_calculation.py
+#
+# Description:
+#   This script computes all three bilateral gradual semantics (ARC, ARH, ARM)
+#   for Weighted Argumentation Graphs (WAG) in a single pass over the
+#   benchmarks: each .bag file is parsed once and the shared graph is handed
+#   to the three semantics in turn.
+#
+# Usage:
+#   1) Place .bag files under 'benchmarks/'.
+#   2) Run: python BGS_semantics_calculation.py
+#   3) The script writes the same CSV files as running ARC_, ARH_ and
+#      ARM_semantics_calculation.py one after another.
+#
+# ------------------------------------------------------------------------------
+
+import os
+from bgs_common import find_bag_files, load_bag, run_on_files
+from ARC_semantics_calculation import process_bag_file_ARC
+from ARH_semantics_calculation import process_bag_file_ARH
+from ARM_semantics_calculation import process_bag_file_ARM
+
+SEMANTICS = {
+    'ARC': process_bag_file_ARC,
+    'ARH': process_bag_file_ARH,
+    'ARM': process_bag_file_ARM,
+}
+
+def run_semantics(kind, bag_file_path, graph, **kwargs):
+    """
+    Run one semantics ('ARC', 'ARH' or 'ARM') on a graph from load_bag.
+    """
+    return SEMANTICS[kind](bag_file_path, graph=graph, **kwargs)
+
+def process_bag_file(bag_file_path, **kwargs):
+    """
+    Parse the .bag file once and run every semantics on it.
+    """
+    try:
+        graph = load_bag(bag_file_path)
+    except Exception as e:
+        print(f"[BGS] Error reading file {bag_file_path}: {e}")
+        return
+
+    for kind in SEMANTICS:
+        run_semantics(kind, bag_file_path, graph, **kwargs)
+
+def main():
+    """
+    Main entry: traverse 'benchmarks/' for .bag files and compute all semantics.
+    """
+    benchmarks_dir = os.path.join(os.getcwd(), 'benchmarks')
+    if not os.path.exists(benchmarks_dir):
+        print(f"[BGS] Benchmarks directory not found: {benchmarks_dir}")
+        return
+
+    run_on_files(process_bag_file, find_bag_files(benchmarks_dir))
+
+if __name__ == "__main__":
+    main()
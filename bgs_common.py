@@ -0,0 +1,335 @@
+# bgs_common.py
+#
+# Description:
+#   Shared parts of the ARC, ARH and ARM scripts. A .bag file is parsed once
+#   into a graph tuple (arguments, w, indptr, indices): the sorted argument
+#   names, their basic weights, and the founded attack relation
+#   Att^*(a) = { b | b attacks a and w(b) > 0 } in CSR form over integer
+#   argument ids. The fixed-point driver then runs a semantics' update
+#   kernel on that graph and writes the CSV output, and the benchmark helpers
+#   spread independent .bag files over a process pool.
+#
+# ------------------------------------------------------------------------------
+
+import contextlib
+import multiprocessing
+import os
+import re
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+# Graphs with at least this many arguments + attacks use the multi-threaded
+# Numba kernels; below it, thread start-up outweighs the per-iteration work.
+PARALLEL_MIN_WORK = 100_000
+
+# Degrees are written to CSV with six decimals, well below the default epsilon
+FLOAT_FORMAT = '%.6f'
+
+# Graphs with at least this many arguments are renumbered in reverse
+# Cuthill-McKee order, so attackers of nearby rows sit close together in f/g
+# once those arrays no longer fit in L2 cache
+REORDER_MIN_ARGUMENTS = 1 << 15
+
+# Number of past steps combined by Anderson acceleration
+ANDERSON_DEPTH = 2
+
+# Parsed graphs are cached next to the .bag file under this suffix. Bump
+# CACHE_VERSION whenever _parse_bag changes, so older caches are rebuilt.
+CACHE_SUFFIX = '.parsed.npz'
+CACHE_VERSION = 2
+
+# One arg(name, weight) or att(attacker, attacked) fact per line; the two
+# fields are split off by _parse_bag, which rejects any other field count
+BAG_PATTERN = re.compile(r'^[ \t]*(arg|att)\((.*)\)[ \t\r]*$', re.M)
+
+def load_bag(bag_file_path, use_cache=True):
+    """
+    Parse a .bag file into (arguments, w, indptr, indices), where the ids of
+    Att^*(arguments[i]) are indices[indptr[i]:indptr[i+1]]. Arguments are
+    sorted by name, except that large graphs are renumbered for locality
+    (see REORDER_MIN_ARGUMENTS). Repeated att facts count once and attackers
+    with w(b)=0 are dropped here, so the kernels need no checks of their own.
+    Self-attacks att(a,a) are kept: a founded a is in Att^*(a) and lowers its
+    own f(a).
+
+    With use_cache, the parsed graph is kept in <bag>.parsed.npz and reused
+    on later runs as long as the .bag file's size and mtime and CACHE_VERSION
+    are unchanged.
+    """
+    cache_path = bag_file_path + CACHE_SUFFIX
+    if use_cache:
+        stamp = _file_stamp(bag_file_path)
+        try:
+            with np.load(cache_path) as cached:
+                if np.array_equal(cached['stamp'], stamp):
+                    return (cached['arguments'].tolist(), cached['w'],
+                            cached['indptr'], cached['indices'])
+        except Exception:
+            # Missing, truncated or otherwise unreadable cache: reparse
+            pass
+
+    graph = _parse_bag(bag_file_path)
+    if use_cache:
+        arguments, w, indptr, indices = graph
+        try:
+            # Write to a temp file of this process, then rename, so neither a
+            # reader nor another process writing the same cache sees half a file
+            tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as file:
+                np.savez(file, stamp=stamp, arguments=np.array(arguments, dtype=str),
+                         w=w, indptr=indptr, indices=indices)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+    return graph
+
+def _file_stamp(path):
+    """
+    (CACHE_VERSION, size, mtime in ns) of a file, used to tell whether a
+    cache is stale.
+    """
+    st = os.stat(path)
+    return np.array([CACHE_VERSION, st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+def _parse_bag(bag_file_path):
+    """
+    Uncached part of load_bag.
+    """
+    with open(bag_file_path, 'r', encoding='utf-8') as file:
+        matches = BAG_PATTERN.findall(file.read())
+    facts = []
+    for kind, content in matches:
+        fields = content.split(',')
+        if len(fields) != 2:
+            raise ValueError(f"malformed fact {kind}({content}): expected 2 fields, got {len(fields)}")
+        facts.append((kind, fields[0].strip(), fields[1].strip()))
+    # Example: arg(a, 0.6)
+    names = np.array([name for kind, name, _ in facts if kind == 'arg'], dtype=str)
+    w_all = np.array([w_str for kind, _, w_str in facts if kind == 'arg'], dtype=np.float64)
+
+    # Sorted unique names; on the reversed lists the first occurrence is the
+    # last arg(...) fact, which decides the weight of a repeated argument
+    arguments, last = np.unique(names[::-1], return_index=True)
+    arguments = arguments.tolist()
+    n = len(arguments)
+    w = w_all[::-1][last]
+    # The name -> id table is the only per-name lookup left after parsing
+    idx = {a: i for i, a in enumerate(arguments)}
+
+    # Example: att(x,a) -> (id of a, id of x); -1 for undeclared arguments
+    pairs = np.array([(idx.get(attacked, -1), idx.get(attacker, -1))
+                      for kind, attacker, attacked in facts if kind == 'att'],
+                     dtype=np.int64).reshape(-1, 2)
+    pairs = pairs[(pairs >= 0).all(axis=1)]
+    # Weights are fixed, so Att^*(a) is filtered here: only w(b) > 0 attackers
+    pairs = pairs[w[pairs[:, 1]] > 0.0]
+    # Sorting by (attacked, attacker) gives the CSR rows; unique drops repeats
+    pairs = np.unique(pairs, axis=0)
+
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pairs[:, 0], minlength=n), out=indptr[1:])
+    indices = np.ascontiguousarray(pairs[:, 1])
+
+    if n >= REORDER_MIN_ARGUMENTS:
+        att = csr_matrix((np.ones(len(indices)), indices, indptr), shape=(n, n))
+        perm = reverse_cuthill_mckee(att).astype(np.int64)
+        att = att[perm][:, perm]
+        att.sort_indices()
+        arguments = [arguments[i] for i in perm]
+        w = w[perm]
+        indptr = att.indptr.astype(np.int64)
+        indices = att.indices.astype(np.int64)
+    return arguments, w, indptr, indices
+
+def attack_matrix(graph):
+    """
+    The rows of the attack matrix A (row = attacked, column = attacker, 1 per
+    attack) for the arguments that have attackers, as a SciPy CSR matrix, so
+    that a sum over Att^*(a) for all of them is the product A @ x.
+    """
+    arguments, w, indptr, indices = graph
+    n = len(arguments)
+    att = csr_matrix((np.ones(len(indices)), indices, indptr), shape=(n, n))
+    return att[np.flatnonzero(indptr[1:] > indptr[:-1])]
+
+def segment_max(values, starts):
+    """
+    Max of per-attack values over CSR rows that all have at least one
+    attacker, given the offsets where the rows start.
+    """
+    if not len(starts):
+        return np.zeros(0)
+    return np.maximum.reduceat(values, starts)
+
+def max_change(f_new, f_old, g_new, g_old):
+    """
+    Largest change max(|f_new - f_old|, |g_new - g_old|) over all arguments,
+    as two vectorized reductions over contiguous float64 arrays.
+    """
+    return float(max(np.abs(f_new - f_old).max(initial=0.0),
+                     np.abs(g_new - g_old).max(initial=0.0)))
+
+def use_parallel_kernel(graph):
+    """
+    Whether a graph from load_bag is large enough for the parallel kernels.
+    """
+    arguments, w, indptr, indices = graph
+    return len(arguments) + len(indices) >= PARALLEL_MIN_WORK
+
+def anderson_mix(xs, gs):
+    """
+    Anderson mixing over recent iterates xs and their updates gs (gs[i] is
+    one update step applied to xs[i]): with residuals F = gs - xs, returns
+      gs[-1] - dG @ gamma,  gamma = argmin || F[-1] - dF @ gamma ||
+    where dF, dG hold the differences of consecutive residuals / updates.
+    """
+    res = [g - x for x, g in zip(xs, gs)]
+    d_res = np.column_stack([res[i + 1] - res[i] for i in range(len(res) - 1)])
+    d_gs = np.column_stack([gs[i + 1] - gs[i] for i in range(len(gs) - 1)])
+    gamma = np.linalg.lstsq(d_res, res[-1], rcond=None)[0]
+    return gs[-1] - d_gs @ gamma
+
+def write_rows(file, row_format, *columns):
+    """
+    Write row_format % row for each row of the zipped columns. Argument names
+    never contain commas, so no CSV quoting is needed, and one join of
+    %-formatted rows is several times cheaper than pandas, csv or np.savetxt.
+    """
+    file.write(''.join([row_format % row for row in zip(*columns)]))
+
+def run_fixed_point(tag, bag_file_path, graph, iterate, iterate_args=(),
+                    epsilon=1e-4, max_iterations=20, save_iterations=True, accelerate=False):
+    """
+    Starting from f(a)=w(a), g(a)=0, repeatedly call
+      iterate(indptr, indices, active, w, f_prev, g_prev, out_f, out_g, *iterate_args)
+    (which updates the arguments in active, i.e. those with attackers, and
+    returns the largest change in f or g) until that change drops below
+    epsilon or max_iterations is reached. Prints and saves the final degrees
+    as <bag>_<tag>_final.csv; per-iteration values are streamed to
+    <bag>_<tag>_iter.csv only if save_iterations; both list arguments by name.
+    Returns the final (f, g), indexed like the graph's arguments.
+
+    With accelerate, each iterate is replaced by the Anderson mix of the last
+    ANDERSON_DEPTH + 1 steps. Whenever the step after a mix changes more than
+    the step before it, the mixing history is dropped and iteration carries
+    on from the plain update.
+    """
+    arguments, w, indptr, indices = graph
+    n = len(arguments)
+    # Contiguous float64 keeps the reductions vectorized and the Numba
+    # kernels on a single compiled specialisation
+    w = np.ascontiguousarray(w, dtype=np.float64)
+    # Output lists arguments by name, whatever order the graph uses
+    order = np.argsort(np.array(arguments, dtype=str), kind='stable')
+    out_arguments = [arguments[i] for i in order]
+    name = os.path.basename(bag_file_path)
+    out_prefix = os.path.splitext(bag_file_path)[0] + '_' + tag.lower()
+
+    # Initialize f^0(a)=w(a), g^0(a)=0
+    f_current = w.copy()
+    g_current = np.zeros(n)
+    # Arguments without attackers keep f(a)=w(a), g(a)=0 in both buffers, so
+    # the kernels only visit the active ones
+    f_next = w.copy()
+    g_next = np.zeros(n)
+    active = np.flatnonzero(indptr[1:] > indptr[:-1])
+
+    iteration = 0
+    converged = False
+    # Recent (f, g) iterates and their updates, for Anderson mixing
+    xs = []
+    gs = []
+    mixed = False
+    last_delta = np.inf
+
+    with contextlib.ExitStack() as stack:
+        # Stream each iteration to the CSV log instead of keeping them all
+        iter_file = None
+        if save_iterations:
+            iter_file = stack.enter_context(open(out_prefix + '_iter.csv', 'w', encoding='utf-8'))
+            iter_file.write('Iteration,Argument,f(a),g(a)\n')
+
+        while iteration < max_iterations and not converged:
+            iteration += 1
+            max_delta = iterate(indptr, indices, active, w, f_current, g_current, f_next, g_next, *iterate_args)
+            f_current, f_next = f_next, f_current
+            g_current, g_next = g_next, g_current
+
+            if max_delta < epsilon:
+                converged = True
+                print(f"[{tag}] Converged after {iteration} iterations: {name}.")
+            elif accelerate:
+                if mixed and max_delta > last_delta:
+                    # The mixed iterate did worse than plain iteration: restart
+                    xs, gs = [], []
+                    mixed = False
+                else:
+                    xs = xs[-ANDERSON_DEPTH:] + [np.concatenate([f_next, g_next])]
+                    gs = gs[-ANDERSON_DEPTH:] + [np.concatenate([f_current, g_current])]
+                    mixed = len(xs) > 1
+                    if mixed:
+                        x = anderson_mix(xs, gs)
+                        np.clip(x[:n], 0.0, w, out=f_current)
+                        np.clip(x[n:], 0.0, 1.0, out=g_current)
+                last_delta = max_delta
+
+            if iter_file is not None:
+                write_rows(iter_file, f'{iteration},%s,{FLOAT_FORMAT},{FLOAT_FORMAT}\n',
+                           out_arguments, f_current[order].tolist(), g_current[order].tolist())
+
+    if not converged:
+        print(f"[{tag}] Not converged within {max_iterations} iterations: {name}.")
+
+    # Print final
+    print(f"\n[{tag}] Final degrees for {name}:")
+    print("---------------------------------------")
+    print(f"{'Argument':<10} {'f(a)':<12} {'g(a)':<12}")
+    for i, a in zip(order, out_arguments):
+        print(f"{a:<10} {f_current[i]:<12.6f} {g_current[i]:<12.6f}")
+
+    # Final CSV
+    with open(out_prefix + '_final.csv', 'w', encoding='utf-8') as final_file:
+        final_file.write('Argument,f(a),g(a)\n')
+        write_rows(final_file, f'%s,{FLOAT_FORMAT},{FLOAT_FORMAT}\n',
+                   out_arguments, f_current[order].tolist(), g_current[order].tolist())
+    return f_current, g_current
+
+def find_bag_files(benchmarks_dir):
+    """
+    Collect the paths of all .bag files under benchmarks_dir.
+    """
+    bag_files = []
+    for root, dirs, files in os.walk(benchmarks_dir):
+        for file_name in files:
+            if file_name.endswith('.bag'):
+                bag_files.append(os.path.join(root, file_name))
+    return bag_files
+
+def _init_worker():
+    """
+    Pool workers each get whole files, so keep their Numba kernels on one
+    thread rather than oversubscribing the cores.
+    """
+    try:
+        import numba
+    except ImportError:
+        return
+    numba.set_num_threads(1)
+
+def run_on_files(process_file, bag_files):
+    """
+    Call process_file on every .bag file. The files are independent, so with
+    at least one file per CPU core they are spread over a 'spawn' process
+    pool; fewer files are processed in order, as starting workers would
+    cost more than it saves.
+    """
+    workers = os.cpu_count() or 1
+    if workers < 2 or len(bag_files) < workers:
+        for file_path in bag_files:
+            process_file(file_path)
+        return
+
+    with multiprocessing.get_context('spawn').Pool(workers, initializer=_init_worker) as pool:
+        pool.map(process_file, bag_files, chunksize=1)